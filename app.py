@@ -1,12 +1,19 @@
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, VideoProcessorBase, WebRtcMode
-from streamlit_autorefresh import st_autorefresh
+import functools
+import logging
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import av
 import cv2
 import numpy as np
 
 from backend.detector import Detector
 from backend.agentic_reasoner import AgenticReasoner
+from backend._fast import bgr_downscale, downscale_factor, frame_signature, signature_delta
 
 # ----------------------------------------------------
 # PAGE CONFIG
@@ -19,8 +26,13 @@ st.set_page_config(
 # ----------------------------------------------------
 # CSS Theme
 # ----------------------------------------------------
-with open("ui/spectre_theme.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+@st.cache_data
+def _load_css(path):
+    with open(path) as f:
+        return f.read()
+
+
+st.markdown(f"<style>{_load_css('ui/spectre_theme.css')}</style>", unsafe_allow_html=True)
 
 st.markdown(
     "<h1 class='spectre-title'>Agentic Farm Intelligence AR System - Ireland</h1>",
@@ -52,142 +64,373 @@ confidence_threshold = st.sidebar.slider("Detection Confidence", 0.2, 0.9, 0.5,
 camera_choice = st.sidebar.selectbox("Camera Source", ["rear (recommended)", "front"])
 facing_mode = "environment" if camera_choice == "rear (recommended)" else "user"
 
-st_autorefresh(interval=1500, key="intel_refresh")
-
 # ----------------------------------------------------
 # INIT MODELS
 # ----------------------------------------------------
-detector = Detector(confidence_threshold=confidence_threshold)
-reasoner = AgenticReasoner(enabled=run_reasoner)
+# Built once per process and shared by every session; the sidebar tunables
+# are passed per call through ARVideoProcessor.configure().
+@st.cache_resource
+def _get_detector():
+    return Detector()
+
+
+@st.cache_resource
+def _get_reasoner():
+    return AgenticReasoner(enabled=True)
+
+
+detector = _get_detector()
+reasoner = _get_reasoner()
 
 # ----------------------------------------------------
 # VIDEO PROCESSOR
 # ----------------------------------------------------
+_log = logging.getLogger(__name__)
+
+_WRAPPER = textwrap.TextWrapper(width=38, break_long_words=False, drop_whitespace=True)
+
+# Per-frame OpenCV entry points, bound once instead of module attribute lookups
+_rectangle = cv2.rectangle
+
+
+@functools.lru_cache(maxsize=None)
+def _char_widths(font, scale, thick):
+    """
+    Per-glyph advance table for ASCII, measured once per process.
+    Plain lru_cache: it is first hit from streamlit-webrtc's worker
+    thread, which has no ScriptRunContext for st.cache_resource.
+    Line width = table[codes].sum() + thick, matching cv2.getTextSize.
+    """
+    widths = np.zeros(128, np.int32)
+    for c in range(32, 127):
+        widths[c] = cv2.getTextSize(chr(c), font, scale, thick)[0][0] - thick
+    return widths
+
+
 class ARVideoProcessor(VideoProcessorBase):
+    # Lower bound on the longest side of the downscaled frame; Detector resizes the rest
+    detect_size = Detector.imgsz
+    # Frames this close (mean abs grey delta) to the last detected one reuse its result
+    skip_delta = 2.0
+    # Distinct HUD sprites kept around (e.g. two labels flickering in view)
+    hud_cache_size = 16
+    # Seconds before a failed reasoner call is retried for the same label
+    retry_interval = 5.0
+    # HUD text metrics, shared by the glyph-width table and the sprite renderer
+    hud_scale = 0.45        # Smaller for AR mobile
+    hud_thick = 1
+
+    # HUD palette (BGR): arrays feed the NumPy fills, tuples feed OpenCV calls
+    text_color = (255, 255, 255)                        # white
+    box_bg = np.array((18, 20, 27), np.uint8)           # subtle dark grey
+    box_border = np.array((180, 180, 180), np.uint8)    # light grey border
+    box_border_color = tuple(box_border.tolist())
+
     def __init__(self):
         self.frame_count = 0
         self.last_label = None
         self.last_box = None
         self.last_agents = None
+        self._final_lines = None
 
         # Professional HUD font settings
         self.font = cv2.FONT_HERSHEY_DUPLEX
         self.font_scale = 0.55
         self.font_thickness = 1
-        self.text_color = (255, 255, 255)      # white
-        self.box_bg = (18, 20, 27)             # subtle dark grey
-        self.box_border = (180, 180, 180)      # light grey border
         self.box_thickness = 1
-
-    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-        img = frame.to_ndarray(format="bgr24")
-        self.frame_count += 1
-
-        process_interval = max(1, int(15 / max_fps))
-
-        if self.frame_count % process_interval == 0:
-            label, box = detector.detect_single(img)
-
+        # Glyph advances at the HUD scale, for measuring lines without OpenCV
+        self._char_w = _char_widths(self.font, self.hud_scale, self.hud_thick)
+
+        # Pre-rendered HUD sprites keyed by their text lines, oldest evicted first
+        self._hud_cache = {}
+
+        # Latest-frame slot for the inference worker (older frames are dropped)
+        self._in_slot = None
+        self._in_lock = threading.Lock()
+        self._in_evt = threading.Event()
+        self._out_lock = threading.Lock()
+        # Bumped on every published result; the panel re-renders only on change
+        self.result_rev = 0
+        self._stopped = False
+        self._prev_sig = None
+        # (shape, stride) the signature was taken at; a resolution change re-detects
+        self._prev_geom = None
+
+        # Sidebar tunables, pushed in by configure() on every rerun
+        self._process_interval = 3
+        self._run_reasoner = False
+        self._conf = 0.5
+
+        # Reasoner calls run off the worker so detection continues during the LLM round-trip
+        self._exec = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._retry_at = 0.0
+
+        threading.Thread(target=self._infer_loop, daemon=True).start()
+
+    def _infer_loop(self):
+        """
+        Background worker: runs detection + reasoning on the latest published
+        frame so recv() never blocks on model latency.
+        """
+        while True:
+            self._in_evt.wait()
+            with self._in_lock:
+                slot = self._in_slot
+                self._in_slot = None
+                self._in_evt.clear()
+
+            if self._stopped:
+                return
+            if slot is None:
+                continue
+
+            try:
+                self._process(*slot)
+            except Exception:
+                # A transient predict/submit failure must not kill the worker
+                _log.exception("inference worker iteration failed")
+                self._prev_sig = None
+                with self._out_lock:
+                    self.last_label = None
+                    self.last_box = None
+                    self.last_agents = None
+                    self._final_lines = None
+                    self.result_rev += 1
+
+    def _process(self, small, k):
+        """
+        Detect on one downscaled frame (stride k) and publish the result.
+        """
+        self._collect_agents()
+
+        sig = frame_signature(small)
+        geom = (small.shape, k)
+        if (self._prev_sig is not None and geom == self._prev_geom
+                and signature_delta(sig, self._prev_sig) < self.skip_delta):
+            # Static scene: still retry a reasoner answer that failed or never came
+            if (self._run_reasoner and self.last_label and self.last_agents is None
+                    and self._pending is None and time.monotonic() >= self._retry_at):
+                self._submit(self.last_label)
+            return
+        self._prev_sig = sig
+        self._prev_geom = geom
+
+        label, box = detector.detect_single(small, conf=self._conf)
+        if box:
+            box = tuple(v * k for v in box)
+        agents = None
+        if label and self._run_reasoner:
+            # Same object still in view: keep its agent outputs
+            if label == self.last_label and self.last_agents is not None:
+                agents = self.last_agents
+            elif self._pending is None:
+                if label != self.last_label or time.monotonic() >= self._retry_at:
+                    self._submit(label)
+            elif self._pending[0] != label:
+                self._submit(label)
+
+        final_lines = self._build_lines(label, agents) if label else None
+
+        with self._out_lock:
             if label:
                 self.last_label = label
                 self.last_box = box
-                self.last_agents = reasoner.explain_structured(label) if run_reasoner else None
+                self.last_agents = agents
+                self._final_lines = final_lines
             else:
                 self.last_label = None
                 self.last_box = None
                 self.last_agents = None
+                self._final_lines = None
+
+            self.result_rev += 1
+
+    def _submit(self, label):
+        """
+        Queue a reasoner call for `label`, cancelling the one it replaces
+        if that has not started yet, so at most one call waits behind the
+        running one.
+        """
+        if self._pending is not None:
+            self._pending[1].cancel()
+        self._pending = (label, self._exec.submit(reasoner.explain_structured, label))
+
+    def _collect_agents(self):
+        """
+        Publish the reasoner answer once its background call has finished,
+        provided the same object is still the current detection.
+        """
+        if self._pending is None or not self._pending[1].done():
+            return
+        label, fut = self._pending
+        self._pending = None
+
+        agents = fut.result() if fut.exception() is None else None
+        if not agents:
+            self._retry_at = time.monotonic() + self.retry_interval
+            return
+        if label != self.last_label or not self._run_reasoner:
+            return
+
+        final_lines = self._build_lines(label, agents)
+        with self._out_lock:
+            self.last_agents = agents
+            self._final_lines = final_lines
+            self.result_rev += 1
+
+    def configure(self, max_fps, run_reasoner, confidence_threshold):
+        """
+        Snapshot the sidebar settings onto the processor.
+        """
+        self._process_interval = max(1, int(15 / max_fps))
+        if bool(run_reasoner) != self._run_reasoner:
+            self._run_reasoner = bool(run_reasoner)
+            # Re-detect so agent outputs are requested (or dropped) on a steady scene
+            self._prev_sig = None
+            if not self._run_reasoner and self._pending is not None:
+                # An answer still in flight must not reach the HUD
+                self._pending[1].cancel()
+                self._pending = None
+        if confidence_threshold != self._conf:
+            self._conf = confidence_threshold
+            # Re-detect even if the scene has not changed
+            self._prev_sig = None
+
+    def on_ended(self):
+        self._stopped = True
+        self._in_evt.set()
+        self._exec.shutdown(wait=False)
+
+    def _build_lines(self, label, agents):
+        """
+        Wrap the label and agent outputs into HUD text lines.
+        Called once per detection, not per drawn frame; the returned
+        tuple doubles as the HUD sprite cache key.
+        """
+        final_lines = [label.upper()]
+
+        if agents:
+            sust = agents.get("SUSTAINABILITY") or ""
+            econ = agents.get("ECONOMETRICS") or ""
+            haz  = agents.get("HAZARD") or ""
+            sc   = agents.get("SUPPLY_CHAIN") or ""
+            lpis = agents.get("LPIS_GEO") or ""
+
+            final_lines += _WRAPPER.wrap("SUST ▸ " + sust)
+            final_lines += _WRAPPER.wrap("ECON ▸ " + econ)
+            final_lines += _WRAPPER.wrap("HAZ ▸ "  + haz)
+            final_lines += _WRAPPER.wrap("SCM ▸ "  + sc)
+            final_lines += _WRAPPER.wrap("LPIS ▸ " + lpis)
+
+        return tuple(final_lines)
+
+    def _render_hud(self, final_lines, font, scale, thick, line_h, max_width):
+        """
+        Render background, border and all text lines of the HUD once.
+        Returns: BGR sprite (np.ndarray) to be blitted onto frames.
+        """
+        # Measure actual max width (non-ASCII glyphs render as '?')
+        char_w = self._char_w
+        w_list = [
+            char_w[np.frombuffer(t.encode("ascii", "replace"), np.uint8)].sum() + thick
+            for t in final_lines
+        ]
+        text_w = min(int(max(w_list)), max_width)
+        total_h = line_h * len(final_lines) + 10
+
+        sprite = np.empty((total_h + 1, text_w + 23, 3), np.uint8)
+
+        # ---------- DRAW BACKGROUND + 1 PX BORDER ----------
+        sprite[:] = self.box_border
+        sprite[1:-1, 1:-1] = self.box_bg
+
+        # ---------- DRAW ALL TEXT LINES ----------
+        y_text = 18
+        for line in final_lines:
+            cv2.putText(
+                sprite,
+                line,
+                (10, y_text),
+                font,
+                scale,
+                self.text_color,
+                thick,
+                cv2.LINE_AA,
+            )
+            y_text += line_h
+
+        return sprite
+
+    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
+        self.frame_count += 1
+        publish = self.frame_count % self._process_interval == 0
+
+        with self._out_lock:
+            box, final_lines = self.last_box, self._final_lines
+        overlay = bool(final_lines and box)
+
+        # Nothing to detect or draw: hand the decoded frame straight back
+        if not publish and not overlay:
+            return frame
+
+        img = frame.to_ndarray(format="bgr24")
+
+        if publish:
+            h, w = img.shape[:2]
+            k = downscale_factor(h, w, self.detect_size)
+            small = np.empty((h // k, w // k, 3), np.uint8)
+            bgr_downscale(img, small)
 
-                       # ----------------------------------------------------
+            with self._in_lock:
+                self._in_slot = (small, k)
+                self._in_evt.set()
+
+        if not overlay:
+            return frame
+
+        # ----------------------------------------------------
         # DRAW PROFESSIONAL, COMPACT MOBILE-FRIENDLY HUD
         # ----------------------------------------------------
-        if self.last_label and self.last_box:
-            x1, y1, x2, y2 = self.last_box
-
-            # bounding box
-            cv2.rectangle(img, (x1, y1), (x2, y2), self.box_border, 2)
-
-            # ---------- TEXT WRAPPING FUNCTION ----------
-            def wrap(text, max_len=38):
-                words = text.split()
-                lines = []
-                line = ""
-                for w in words:
-                    if len(line) + len(w) + 1 <= max_len:
-                        line += (" " + w) if line else w
-                    else:
-                        lines.append(line)
-                        line = w
-                if line:
-                    lines.append(line)
-                return lines
-
-            # ---------- BUILD LINES ----------
-            final_lines = []
-            final_lines.append(self.last_label.upper())
-
-            if self.last_agents:
-                sust = self.last_agents.get("SUSTAINABILITY") or ""
-                econ = self.last_agents.get("ECONOMETRICS") or ""
-                haz  = self.last_agents.get("HAZARD") or ""
-                sc   = self.last_agents.get("SUPPLY_CHAIN") or ""
-                lpis = self.last_agents.get("LPIS_GEO") or ""
-
-                for ln in wrap("SUST ▸ " + sust): final_lines.append(ln)
-                for ln in wrap("ECON ▸ " + econ): final_lines.append(ln)
-                for ln in wrap("HAZ ▸ "  + haz):  final_lines.append(ln)
-                for ln in wrap("SCM ▸ "  + sc):   final_lines.append(ln)
-                for ln in wrap("LPIS ▸ " + lpis): final_lines.append(ln)
+        x1, y1, x2, y2 = box
+        img_h, img_w = img.shape[:2]
+
+        # Box from a larger frame (resolution dropped before re-detection): skip it
+        if x2 > img_w or y2 > img_h:
+            return frame
 
+        # bounding box
+        _rectangle(img, (x1, y1), (x2, y2), self.box_border_color, 2)
+
+        sprite = self._hud_cache.get(final_lines)
+        if sprite is None:
             # ---------- FONT + COMPACT METRICS ----------
             font = self.font
-            scale = 0.45        # Smaller for AR mobile
-            thick = 1
+            scale = self.hud_scale
+            thick = self.hud_thick
             line_h = 20         # fixed-height per text line
             max_width = 320     # FORCE HUD WIDTH (IMPORTANT)
 
-            # Measure actual max width
-            w_list = [
-                cv2.getTextSize(t, font, scale, thick)[0][0]
-                for t in final_lines
-            ]
-            text_w = min(max(w_list), max_width)
-            total_h = line_h * len(final_lines) + 10
-
-            # HUD position (above box)
-            hud_x = x1
-            hud_y = max(0, y1 - total_h - 10)
-
-            # ---------- DRAW BACKGROUND ----------
-            cv2.rectangle(
-                img,
-                (hud_x, hud_y),
-                (hud_x + text_w + 22, hud_y + total_h),
-                self.box_bg,
-                -1
-            )
+            sprite = self._render_hud(final_lines, font, scale, thick, line_h, max_width)
+            if len(self._hud_cache) >= self.hud_cache_size:
+                del self._hud_cache[next(iter(self._hud_cache))]
+            self._hud_cache[final_lines] = sprite
 
-            cv2.rectangle(
-                img,
-                (hud_x, hud_y),
-                (hud_x + text_w + 22, hud_y + total_h),
-                self.box_border,
-                1
-            )
+        # HUD position (above box), clipped to the frame
+        h, w = sprite.shape[:2]
+        hud_x = min(max(0, x1), img_w)
+        hud_y = min(max(0, y1 - h - 9), img_h)
+        vis_h = min(h, img_h - hud_y)
+        vis_w = min(w, img_w - hud_x)
 
-            # ---------- DRAW ALL TEXT LINES ----------
-            y_text = hud_y + 18
-            for line in final_lines:
-                cv2.putText(
-                    img,
-                    line,
-                    (hud_x + 10, y_text),
-                    font,
-                    scale,
-                    self.text_color,
-                    thick,
-                    cv2.LINE_AA,
-                )
-                y_text += line_h
+        # ---------- BLIT PRE-RENDERED HUD ----------
+        if vis_h > 0 and vis_w > 0:
+            img[hud_y:hud_y + vis_h, hud_x:hud_x + vis_w] = sprite[:vis_h, :vis_w]
+
+        out = av.VideoFrame.from_ndarray(img, format="bgr24")
+        out.pts = frame.pts
+        out.time_base = frame.time_base
+        return out
 
 # ----------------------------------------------------
 # PAGE LAYOUT
@@ -212,18 +455,30 @@ with col_video:
         async_processing=True,
     )
 
+    if webrtc_ctx.video_processor:
+        webrtc_ctx.video_processor.configure(max_fps, run_reasoner, confidence_threshold)
+
 # ----------------------------------------------------
 # INTELLIGENCE PANEL
 # ----------------------------------------------------
-with col_panel:
+@st.fragment(run_every=1.5)
+def intelligence_panel(webrtc_ctx):
+    """
+    Re-runs on its own timer without rerunning the whole script, and only
+    rebuilds the panel when the processor has published a new result.
+    """
     st.markdown("Intelligence Panel", unsafe_allow_html=True)
     panel = st.empty()
 
-    intel = None
-
+    vp = None
     if webrtc_ctx and webrtc_ctx.state.playing and webrtc_ctx.video_processor:
         vp = webrtc_ctx.video_processor
-        if vp.last_label and vp.last_agents:
+
+    rev = (id(vp), vp.result_rev) if vp else None
+    if rev is None or rev != st.session_state.get("intel_rev"):
+        intel = None
+
+        if vp and vp.last_label and vp.last_agents:
             intel = {
                 "Object": vp.last_label,
                 "Sust": vp.last_agents.get("SUSTAINABILITY"),
@@ -233,9 +488,8 @@ with col_panel:
                 "LPIS": vp.last_agents.get("LPIS_GEO"),
             }
 
-    if intel:
-        panel.markdown(
-            f"""
+        if intel:
+            html = f"""
             <div class='spectre-panel'>
               <b>Detected:</b> {intel["Object"]}<br><br>
               <b>Sustainability</b><br>{intel["Sust"]}<br><br>
@@ -244,11 +498,15 @@ with col_panel:
               <b>Hazard</b><br>{intel["Haz"]}<br><br>
               <b>LPIS / GEO</b><br>{intel["LPIS"]}
             </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    else:
-        panel.markdown(
-            "<div class='spectre-panel'>No object detected yet. Hold the camera steady.</div>",
-            unsafe_allow_html=True,
-        )
+            """
+        else:
+            html = "<div class='spectre-panel'>No object detected yet. Hold the camera steady.</div>"
+
+        st.session_state["intel_rev"] = rev
+        st.session_state["intel_html"] = html
+
+    panel.markdown(st.session_state["intel_html"], unsafe_allow_html=True)
+
+
+with col_panel:
+    intelligence_panel(webrtc_ctx)
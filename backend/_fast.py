@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+    prange = range
+
+
+def downscale_factor(h: int, w: int, target: int) -> int:
+    """
+    Integer stride that brings the longest side of an (h, w) frame
+    down to roughly `target` pixels (never below it), leaving the
+    detector's resize only a small final step to `target`.
+    """
+    return max(1, max(h, w) // target)
+
+
+def frame_signature(img: np.ndarray) -> np.ndarray:
+    """
+    32x32 grayscale thumbnail of a BGR frame, used to spot frames that
+    differ from a previous one only by sensor noise.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def signature_delta(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean absolute difference between two signatures (0-255 scale).
+    """
+    return float(np.abs(a - b).mean())
+
+
+def _bgr_downscale(src, dst):
+    """
+    Area-average a BGR uint8 frame into a pre-allocated destination.
+    src: (H, W, 3), dst: (H // k, W // k, 3) for an integer stride k.
+    """
+    k = src.shape[0] // dst.shape[0]
+    norm = k * k
+    half = norm // 2
+    for y in prange(dst.shape[0]):
+        sy = y * k
+        for x in range(dst.shape[1]):
+            sx = x * k
+            for c in range(3):
+                acc = 0
+                for dy in range(k):
+                    for dx in range(k):
+                        acc += src[sy + dy, sx + dx, c]
+                dst[y, x, c] = (acc + half) // norm
+
+
+def _bgr_to_chw_f32(src, dst):
+    """
+    Fused BGR->RGB swap, 1/255 scaling and HWC->CHW transpose.
+    src: (H, W, 3) uint8, dst: (3, >=H, >=W) float32; only the
+    top-left H x W window of dst is written.
+    """
+    for y in prange(src.shape[0]):
+        for x in range(src.shape[1]):
+            for c in range(3):
+                dst[2 - c, y, x] = src[y, x, c] * (1.0 / 255.0)
+
+
+try:
+    # Ahead-of-time build, see backend/build_fast.py
+    from backend._fast_aot import bgr_downscale, bgr_to_chw_f32
+except ImportError:
+    if _HAS_NUMBA:
+        _jit = njit(parallel=True, cache=True, boundscheck=False, fastmath=True)
+        bgr_downscale = _jit(_bgr_downscale)
+        bgr_to_chw_f32 = _jit(_bgr_to_chw_f32)
+    else:
+        def bgr_downscale(src, dst):
+            dh, dw = dst.shape[:2]
+            k = src.shape[0] // dh
+            blocks = src[:dh * k, :dw * k].reshape(dh, k, dw, k, 3)
+            norm = k * k
+            dst[:] = (blocks.sum(axis=(1, 3), dtype=np.uint32) + norm // 2) // norm
+
+        def bgr_to_chw_f32(src, dst):
+            h, w = src.shape[:2]
+            np.multiply(src[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=dst[:, :h, :w])
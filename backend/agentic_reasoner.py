@@ -1,4 +1,6 @@
-from typing import Optional, Dict
+import re
+import time
+from typing import Optional, Dict, Tuple
 
 try:
     from openai import OpenAI
@@ -6,6 +8,14 @@ try:
 except ImportError:
     _HAS_OPENAI = False
 
+_AGENT_KEYS = ("SUSTAINABILITY", "SUPPLY_CHAIN", "ECONOMETRICS", "HAZARD", "LPIS_GEO")
+
+# One "KEY: value" answer line per match, key case-insensitive
+_AGENT_RE = re.compile(
+    r"^[ \t]*(" + "|".join(_AGENT_KEYS) + r")[ \t]*:(.*?)\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
 
 class AgenticReasoner:
     """
@@ -19,8 +29,12 @@ class AgenticReasoner:
       - LPIS_GEO
     """
 
+    # Seconds a label's outputs are reused before the model is asked again
+    cache_ttl = 300.0
+
     def __init__(self, enabled: bool = False):
         self.enabled = enabled
+        self._cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
         if _HAS_OPENAI:
             self.client = OpenAI()
         else:
@@ -66,28 +80,27 @@ LPIS_GEO: <one sentence about likely LPIS/CORINE class or spatial relevance in I
         except Exception:
             return None
 
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-        out: Dict[str, str] = {
-            "SUSTAINABILITY": "",
-            "SUPPLY_CHAIN": "",
-            "ECONOMETRICS": "",
-            "HAZARD": "",
-            "LPIS_GEO": "",
-        }
-
-        for ln in lines:
-            upper = ln.upper()
-            for key in out.keys():
-                prefix = key + ":"
-                if upper.startswith(prefix):
-                    value = ln[len(prefix):].strip(" :-")
-                    out[key] = value
-                    break
+        out: Dict[str, str] = {key: "" for key in _AGENT_KEYS}
+
+        for m in _AGENT_RE.finditer(text):
+            out[m.group(1).upper()] = m.group(2).strip(" :-")
 
         return out
 
     def explain_structured(self, label: str) -> Optional[Dict[str, str]]:
         """
         Returns full multi-agent dict, suitable for HUD + side panel.
+        Successful answers are cached per label for `cache_ttl` seconds.
         """
-        return self._call_openai(label)
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        hit = self._cache.get(label)
+        if hit is not None and now - hit[0] < self.cache_ttl:
+            return hit[1]
+
+        out = self._call_openai(label)
+        if out is not None:
+            self._cache[label] = (now, out)
+        return out
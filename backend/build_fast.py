@@ -0,0 +1,24 @@
+"""
+Ahead-of-time build of the backend._fast kernels.
+
+    python -m backend.build_fast
+
+Writes the native backend/_fast_aot extension next to this file.
+backend._fast prefers it over the @njit version, so the first processed
+frame does not stall on Numba's JIT compile.
+"""
+import os
+
+from numba.pycc import CC
+
+from backend._fast import _bgr_downscale, _bgr_to_chw_f32
+
+cc = CC("_fast_aot")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export("bgr_downscale", "void(u1[:,:,:], u1[:,:,:])")(_bgr_downscale)
+cc.export("bgr_to_chw_f32", "void(u1[:,:,:], f4[:,:,:])")(_bgr_to_chw_f32)
+
+
+if __name__ == "__main__":
+    cc.compile()
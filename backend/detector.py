@@ -1,3 +1,8 @@
+import os
+import sys
+import threading
+
+import cv2
 import numpy as np
 
 try:
@@ -6,6 +11,38 @@ try:
 except ImportError:
     _HAS_YOLO = False
 
+try:
+    import torch
+    _HAS_TORCH = True
+except ImportError:
+    _HAS_TORCH = False
+
+from backend._fast import bgr_to_chw_f32
+
+# Candidate weights, fastest backend first; see backend/export_model.py
+_WEIGHTS = (
+    "yolov8n.engine",       # TensorRT (CUDA only)
+    "yolov8n.mlpackage",    # CoreML (macOS only)
+    "yolov8n.mlmodel",
+    "yolov8n.onnx",
+    "yolov8n.pt",
+)
+
+
+def _pick_weights(device: str) -> str:
+    """
+    First exported artifact on disk that can run on `device`,
+    else the PyTorch checkpoint (downloaded by Ultralytics if missing).
+    """
+    for path in _WEIGHTS:
+        if path.endswith(".engine") and not device.startswith("cuda"):
+            continue
+        if path.endswith((".mlpackage", ".mlmodel")) and sys.platform != "darwin":
+            continue
+        if os.path.exists(path):
+            return path
+    return "yolov8n.pt"
+
 
 class Detector:
     """
@@ -13,50 +50,121 @@ class Detector:
     Returns a single best bounding box and label for simplicity.
     """
 
-    def __init__(self, confidence_threshold: float = 0.5):
-        self.confidence_threshold = confidence_threshold
+    # Model input size (longest side) and the network stride
+    imgsz = 416
+    stride = 32
+
+    def __init__(self):
         self.model = None
+        # The instance is shared across sessions; YOLO predict is not re-entrant.
+        self._lock = threading.Lock()
+        # Reused NCHW float32 input buffer (see _to_tensor)
+        self._infer_in = None
+
+        # Pin the inference device; FP16 only pays off on an accelerator
+        self.device = "cpu"
+        if _HAS_TORCH:
+            if torch.cuda.is_available():
+                self.device = "cuda:0"
+            elif torch.backends.mps.is_available():
+                self.device = "mps"
+
+        self.weights = _pick_weights(self.device)
+        self._is_pt = self.weights.endswith(".pt")
+        # Exported backends bake in their precision, except TensorRT which honours half
+        self.half = self.device != "cpu" and (self._is_pt or self.weights.endswith(".engine"))
 
         if _HAS_YOLO:
             try:
-                self.model = YOLO("yolov8n.pt")
+                self.model = YOLO(self.weights, task="detect")
+                if self._is_pt:
+                    self.model.to(self.device)
             except Exception:
                 self.model = None
 
-    def detect_single(self, img: np.ndarray):
+    def detect_single(self, img: np.ndarray, conf: float = 0.5):
         """
-        Detect the most confident object in the frame.
+        Detect the most confident object in the frame above `conf`.
         Returns: (label: str or None, bbox: (x1, y1, x2, y2) or None)
         """
-        h, w, _ = img.shape
+        return self.detect_batch([img], conf)[0]
 
-        if self.model is None:
-            return None, None
+    def detect_batch(self, imgs, conf: float = 0.5):
+        """
+        Detect the most confident object in each frame with a single
+        forward pass over the whole batch, keeping boxes above `conf`.
+        Returns: list of (label, bbox) tuples, one per input frame.
+        """
+        if self.model is None or len(imgs) == 0:
+            return [(None, None)] * len(imgs)
 
-        results = self.model.predict(
-            source=img,
-            conf=self.confidence_threshold,
-            verbose=False,
-        )
+        # Downscale once to the model size; boxes are mapped back in _best
+        scales = [min(1.0, self.imgsz / max(img.shape[:2])) for img in imgs]
+        small = [
+            cv2.resize(img, None, fx=sc, fy=sc, interpolation=cv2.INTER_LINEAR) if sc < 1.0 else img
+            for img, sc in zip(imgs, scales)
+        ]
+
+        with self._lock:
+            results = self.model.predict(
+                source=self._to_tensor(small),
+                imgsz=self.imgsz,
+                device=self.device,
+                half=self.half,
+                conf=conf,
+                verbose=False,
+            )
 
         if not results or len(results) == 0:
-            return None, None
+            return [(None, None)] * len(imgs)
 
-        boxes = results[0].boxes
+        return [
+            self._best(res, img.shape, sc)
+            for res, img, sc in zip(results, imgs, scales)
+        ]
+
+    def _to_tensor(self, imgs):
+        """
+        Pack BGR frames into a reused float32 NCHW buffer in one fused pass,
+        padded bottom/right to the stride so box coordinates are unchanged.
+        Falls back to Ultralytics' own preprocessing when that is not possible.
+        """
+        h, w = imgs[0].shape[:2]
+        if (
+            not _HAS_TORCH
+            # exported backends have a static imgsz x imgsz input; let Ultralytics letterbox
+            or not self._is_pt
+            or max(h, w) > self.imgsz
+            or any(img.shape[:2] != (h, w) for img in imgs)
+        ):
+            return list(imgs)
+
+        s = self.stride
+        shape = (len(imgs), 3, -(-h // s) * s, -(-w // s) * s)
+        if self._infer_in is None or self._infer_in.shape != shape:
+            # Padding keeps YOLO's letterbox grey; only the frame window is overwritten
+            self._infer_in = np.full(shape, 114 / 255, np.float32)
+
+        for img, dst in zip(imgs, self._infer_in):
+            bgr_to_chw_f32(img, dst)
+
+        return torch.from_numpy(self._infer_in)
+
+    def _best(self, result, shape, scale=1.0):
+        h, w = shape[:2]
+
+        boxes = result.boxes
         if boxes is None or len(boxes) == 0:
             return None, None
 
-        best_idx = int(boxes.conf.argmax().item())
-        best_box = boxes[best_idx]
-        cls_id = int(best_box.cls.item())
-        label = results[0].names.get(cls_id, "object")
-
-        x1, y1, x2, y2 = best_box.xyxy[0].tolist()
-        x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
+        # One device->host transfer for all boxes: rows are (x1, y1, x2, y2, conf, cls)
+        data = boxes.data.cpu().numpy()
+        best = data[data[:, 4].argmax()]
+        label = result.names.get(int(best[5]), "object")
 
-        x1 = max(0, min(x1, w - 1))
-        x2 = max(0, min(x2, w - 1))
-        y1 = max(0, min(y1, h - 1))
-        y2 = max(0, min(y2, h - 1))
+        xyxy = (best[:4] / scale).astype(np.int32)
+        xyxy[0::2] = np.clip(xyxy[0::2], 0, w - 1)
+        xyxy[1::2] = np.clip(xyxy[1::2], 0, h - 1)
+        x1, y1, x2, y2 = xyxy.tolist()
 
         return label, (x1, y1, x2, y2)
@@ -0,0 +1,29 @@
+"""
+One-shot export of the YOLO weights to an optimised inference backend.
+
+    python -m backend.export_model            # ONNX (CPU / any platform)
+    python -m backend.export_model engine     # TensorRT, FP16 (NVIDIA GPU)
+    python -m backend.export_model coreml     # CoreML (macOS / Apple Silicon)
+
+The exported file is written next to yolov8n.pt; Detector picks the
+fastest artifact that can run on the current device automatically.
+"""
+import sys
+
+from ultralytics import YOLO
+
+from backend.detector import Detector
+
+
+def export(fmt: str = "onnx") -> str:
+    model = YOLO("yolov8n.pt")
+    return model.export(
+        format=fmt,
+        imgsz=Detector.imgsz,
+        half=fmt == "engine",
+        dynamic=False,
+    )
+
+
+if __name__ == "__main__":
+    print(export(*sys.argv[1:2]))